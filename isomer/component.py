@@ -55,7 +55,7 @@ from formal import model_factory
 # noinspection PyUnresolvedReferences
 from isomer.events.system import isomer_ui_event, authorized_event, anonymous_event
 from isomer.events.client import send
-from isomer.logger import isolog, warn, critical, error, verbose
+from isomer.logger import isolog, is_enabled, warn, critical, error, verbose, info
 from isomer.schemata.component import ComponentBaseConfigSchema
 from isomer.misc import nested_map_update
 from jsonschema import ValidationError
@@ -196,6 +196,9 @@ class LoggingMeta(BaseMeta):
     def log(self, *args, **kwargs):
         """Log a statement from this component"""
 
+        if not is_enabled(kwargs.get("lvl", info)):
+            return
+
         func = inspect.currentframe().f_back.f_code
         # Dump the message + the name of this function to the log.
 
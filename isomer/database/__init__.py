@@ -36,7 +36,12 @@ Objectstore builder functions.
 """
 
 import sys
+import json
+from collections.abc import Mapping
+import hashlib
+import importlib.util
 import formal
+import formal.database
 import jsonschema
 import pymongo
 
@@ -56,6 +61,9 @@ def db_log(*args, **kwargs):
 objectmodels = None
 collections = None
 
+client = None
+db = None
+
 dbhost = ""
 dbport = 0
 dbname = ""
@@ -77,12 +85,11 @@ def clear_all():
         db_log("Not deleting the database.")
         sys.exit()
 
-    client = pymongo.MongoClient(host=dbhost, port=dbport)
-    db = client[dbname]
-
-    for col in db.collection_names(include_system_collections=False):
+    for col in db.list_collection_names():
         db_log("Dropping collection ", col, lvl=warn)
-        db.drop_collection(col)
+
+    # A single command drops all collections including their indices
+    client.drop_database(dbname)
 
 
 class IsomerBaseModel(formal.formalModel):
@@ -100,22 +107,65 @@ class IsomerBaseModel(formal.formalModel):
         return cls.find_one({"uuid": uuid})
 
 
-def _build_model_factories(store):
-    """Generate factories to construct objects from schemata"""
+_factory_cache = {}
 
-    result = {}
 
-    for schemaname in store:
+def cached_model_factory(schema, base_class=IsomerBaseModel):
+    """Construct a model factory or reuse one built earlier from an identical
+    schema"""
+
+    if schema.get("sql", False):
+        # SQL factories bind the current engine on creation, so never reuse them
+        return formal.model_factory(schema, base_class)
+
+    key = (
+        hashlib.blake2b(
+            json.dumps(schema, sort_keys=True, default=str).encode("utf-8"),
+            digest_size=16,
+        ).hexdigest(),
+        base_class,
+    )
+
+    try:
+        return _factory_cache[key]
+    except KeyError:
+        factory = _factory_cache[key] = formal.model_factory(schema, base_class)
+        return factory
+
+
+class LazyFactoryMap(Mapping):
+    """Read only mapping of schema names to model factories, which builds
+    each factory on first access
+
+    Schemata whose factory can't be built are remembered and left out, like
+    they were never registered.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._factories = {}
+        self._failed = set()
+
+    def __getitem__(self, schemaname):
+        try:
+            return self._factories[schemaname]
+        except KeyError:
+            pass
+
+        if schemaname not in self._store or schemaname in self._failed:
+            raise KeyError(schemaname)
 
         schema = None
 
         try:
-            schema = store[schemaname]["schema"]
+            schema = self._store[schemaname]["schema"]
         except KeyError:
             db_log("No schema found for ", schemaname, lvl=critical, exc=True)
+            self._failed.add(schemaname)
+            raise KeyError(schemaname)
 
         try:
-            result[schemaname] = formal.model_factory(schema, IsomerBaseModel)
+            factory = cached_model_factory(schema)
         except Exception as e:
             db_log(
                 "Could not create factory for schema ",
@@ -124,8 +174,39 @@ def _build_model_factories(store):
                 lvl=critical,
                 exc=True,
             )
+            self._failed.add(schemaname)
+            raise KeyError(schemaname)
 
-    return result
+        self._factories[schemaname] = factory
+
+        return factory
+
+    def __contains__(self, schemaname):
+        try:
+            self[schemaname]
+        except KeyError:
+            return False
+
+        return True
+
+    def __iter__(self):
+        # Factories are built here, so callers never get names they can't index
+        for schemaname in list(self._store):
+            if schemaname in self:
+                yield schemaname
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def _build_model_factories(store):
+    """Generate factories to construct objects from schemata
+
+    Factories are only built when a model is first used, so short lived
+    processes do not pay for all registered schemata.
+    """
+
+    return LazyFactoryMap(store)
 
 
 def _build_collections(store):
@@ -133,9 +214,6 @@ def _build_collections(store):
 
     result = {}
 
-    client = pymongo.MongoClient(host=dbhost, port=dbport)
-    db = client[dbname]
-
     for schemaname in store:
 
         schema = None
@@ -210,6 +288,41 @@ def _build_collections(store):
     return result
 
 
+def _get_compressors():
+    """Return the wire protocol compressors supported by installed modules"""
+
+    compressors = [
+        name
+        for name, module in (("zstd", "zstandard"), ("snappy", "snappy"))
+        if importlib.util.find_spec(module) is not None
+    ]
+    compressors.append("zlib")
+
+    return ",".join(compressors)
+
+
+def _get_client(host, port):
+    """Get the shared, compressing client for a database server
+
+    The client is registered with formal as well, so the object models use
+    the same connection pool instead of opening their own.
+    """
+
+    identifier = (host, port)
+    connection = formal.database.connections.get(identifier)
+
+    if connection is None:
+        connection = pymongo.MongoClient(
+            host=host,
+            port=port,
+            compressors=_get_compressors(),
+            zlibCompressionLevel=6,
+        )
+        formal.database.connections[identifier] = connection
+
+    return connection
+
+
 def initialize(
     address="127.0.0.1:27017",
     database_name="isomer-default",
@@ -221,6 +334,8 @@ def initialize(
 
     global objectmodels
     global collections
+    global client
+    global db
     global dbhost
     global dbport
     global dbname
@@ -248,7 +363,7 @@ def initialize(
         abort(EXIT_NO_DATABASE_HOST)
 
     try:
-        client = pymongo.MongoClient(host=dbhost, port=dbport)
+        client = _get_client(dbhost, dbport)
         db = client[dbname]
         db_log("Database: ", db.command("buildinfo"), lvl=debug)
     except Exception as e:
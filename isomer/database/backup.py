@@ -21,10 +21,16 @@
 """Database backup functionality"""
 
 import json
+import os
+import shutil
+import sys
+import tempfile
 from ast import literal_eval
+from concurrent.futures import ThreadPoolExecutor
 
 import bson
 import pymongo
+from bson import json_util
 
 from isomer.logger import isolog, debug, verbose, error, warn
 
@@ -127,76 +133,136 @@ def backup(
     if pretty:
         indent = 4
     else:
-        indent = 0
+        indent = None
 
-    f = None
+    if schema is None:
+        if export_all is False:
+            backup_log("No schema given.", lvl=warn)
+            return
+        else:
+            schemata = list(objectmodels.keys())
+    else:
+        schemata = [schema]
+
+    if uuid:
+        query = {"uuid": uuid}
+    elif export_filter:
+        try:
+            query = literal_eval(export_filter)
+        except (ValueError, SyntaxError):
+            query = None
+
+        if not isinstance(query, dict):
+            backup_log("Export filter is not a valid dictionary:", export_filter, lvl=error)
+            return
+    else:
+        query = {}
 
     if filename:
+        # Written next to the target and only moved there once complete, so a
+        # failed export never leaves a truncated backup behind
+        temporary_filename = filename + ".tmp"
         try:
-            f = open(filename, "w")
+            f = open(temporary_filename, "w")
         except (IOError, PermissionError) as e:
             backup_log("Could not open output file for writing:", exc=True, lvl=error)
             return
+    else:
+        # Do not use logger here! This data must go immediately to stdout.
+        f = sys.stdout
 
-    def output(what, convert=False):
-        """Output the backup in a specified format."""
-
-        if convert:
-            if export_format == "JSON":
-                data = json.dumps(what, indent=indent)
-            else:
-                data = ""
-        else:
-            data = what
+    # Omitted fields are never transferred from the database
+    projection = {field: 0 for field in omit} if omit else None
 
-        if not filename:
-            # Do not use logger here! This data must go immediately to stdout.
-            print(data)
-        else:
-            f.write(data)
+    def dump_schema(schema_item, target):
+        """Write all objects of a schema as JSON array to a target file"""
 
-    if schema is None:
-        if export_all is False:
-            backup_log("No schema given.", lvl=warn)
-            return
-        else:
-            schemata = objectmodels.keys()
-    else:
-        schemata = [schema]
+        model = objectmodels[schema_item]
+        schema_id = model._schema["id"]
 
-    all_items = {}
+        # The model knows its actual collection (collectionName, database etc.)
+        cursor = (
+            model.collection().find(query, projection=projection).batch_size(1000)
+        )
 
-    for schema_item in schemata:
-        model = objectmodels[schema_item]
+        target.write("[")
 
-        if uuid:
-            obj = model.find({"uuid": uuid})
-        elif export_filter:
-            obj = model.find(literal_eval(export_filter))
-        else:
-            obj = model.find()
+        # Objects are encoded and written one by one, so memory consumption
+        # does not grow with the size of the exported collections
+        for item_index, document in enumerate(cursor):
+            # Mirror the model's serializablefields() without hydrating it
+            if "id" not in omit:
+                document["id"] = schema_id
+            if "_id" in document:
+                document["_id"] = str(document["_id"])
 
-        items = []
-        for item in obj:
-            fields = item.serializablefields()
-            for field in omit:
-                try:
-                    fields.pop(field)
-                except KeyError:
-                    pass
-            items.append(fields)
+            if item_index > 0:
+                target.write(",")
+            target.write(json.dumps(document, indent=indent, default=json_util.default))
 
-        all_items[schema_item] = items
+        target.write("]")
 
-        # if pretty is True:
-        #    output('\n// Objectmodel: ' + schema_item + '\n\n')
-        # output(schema_item + ' = [\n')
+    def dump_part(schema_item):
+        """Dump a schema into an anonymous temporary part file"""
 
-    output(all_items, convert=True)
+        part = tempfile.TemporaryFile(mode="w+")
+        try:
+            dump_schema(schema_item, part)
+        except Exception:
+            part.close()
+            raise
+        part.seek(0)
+
+        return part
+
+    completed = False
+    try:
+        if export_format != "JSON":
+            backup_log("Exporting non json data is WiP!", lvl=error)
+        elif len(schemata) == 1:
+            f.write("{" + json.dumps(schemata[0]) + ":")
+            dump_schema(schemata[0], f)
+            f.write("}\n")
+        else:
+            # Collections are exported in parallel into part files, which are
+            # then concatenated in order
+            f.write("{")
+
+            workers = max(1, min(8, len(schemata)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(dump_part, schema_item) for schema_item in schemata
+                ]
+                try:
+                    for schema_index, (schema_item, future) in enumerate(
+                        zip(schemata, futures)
+                    ):
+                        if schema_index > 0:
+                            f.write(",")
+                        f.write(json.dumps(schema_item) + ":")
+                        with future.result() as part:
+                            shutil.copyfileobj(part, f)
+                finally:
+                    # Part files are anonymous, closing them removes them
+                    for future in futures:
+                        if future.cancel() or future.exception() is not None:
+                            continue
+                        future.result().close()
+
+            f.write("}\n")
 
-    if f is not None:
         f.flush()
-        f.close()
+        completed = True
+    finally:
+        if f is not sys.stdout:
+            f.close()
+            if completed:
+                os.replace(temporary_filename, filename)
+            else:
+                try:
+                    os.unlink(temporary_filename)
+                except OSError:
+                    pass
 
 
 def internal_restore(
@@ -20,18 +20,19 @@
 
 """Database maintenance components"""
 
+import heapq
 import operator
 import time
-from os import walk, statvfs
-from os.path import getsize, join
+from concurrent.futures import ThreadPoolExecutor
+from os import scandir, statvfs
+from os.path import join
 
-import pymongo
 from circuits import Timer, Event
 
+from isomer import database
 from isomer.component import ConfigurableComponent, handler
-from isomer.database import dbhost, dbport, dbname
 from isomer.database.backup import backup
-from isomer.logger import verbose, error, warn
+from isomer.logger import is_enabled, verbose, error, warn
 from isomer.misc.path import get_path
 
 
@@ -95,8 +96,7 @@ class Maintenance(ConfigurableComponent):
         super(Maintenance, self).__init__("MAINTENANCE", *args, **kwargs)
         self.log("Maintenance started")
 
-        client = pymongo.MongoClient(dbhost, dbport)
-        self.db = client[dbname]
+        self.db = database.db
 
         self.collection_sizes = {}
         self.collection_total = 0
@@ -120,22 +120,33 @@ class Maintenance(ConfigurableComponent):
     def _check_collections(self):
         """Checks node local collection storage sizes"""
 
-        self.collection_sizes = {}
-        self.collection_total = 0
-        for col in self.db.list_collection_names():
-            self.collection_sizes[col] = self.db.command("collstats", col).get(
-                "storageSize", 0
-            )
-            self.collection_total += self.collection_sizes[col]
+        def get_storage_size(col):
+            """Fetches the storage size of a single collection"""
+
+            return self.db.command("collstats", col).get("storageSize", 0)
+
+        collection_names = self.db.list_collection_names()
 
-        sorted_x = sorted(self.collection_sizes.items(), key=operator.itemgetter(1))
+        # Pymongo releases the GIL while waiting for the server, so the
+        # round trips for all collections can overlap
+        workers = max(1, min(8, len(collection_names)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sizes = executor.map(get_storage_size, collection_names)
+            self.collection_sizes = dict(zip(collection_names, sizes))
 
-        for item in sorted_x:
-            self.log(
-                "Collection size (%s): %.2f MB" % (item[0], item[1] / 1024.0 / 1024),
-                lvl=verbose,
+        self.collection_total = sum(self.collection_sizes.values())
+
+        if is_enabled(verbose):
+            largest = heapq.nlargest(
+                20, self.collection_sizes.items(), key=operator.itemgetter(1)
             )
 
+            for item in largest:
+                self.log(
+                    "Collection size (%s): %.2f MB" % (item[0], item[1] / 1024.0 / 1024),
+                    lvl=verbose,
+                )
+
         self.log(
             "Total collection sizes: %.2f MB" % (self.collection_total / 1024.0 / 1024)
         )
@@ -147,15 +158,26 @@ class Maintenance(ConfigurableComponent):
             """Aggregates used size of a specified path, recursively"""
 
             total_size = 0
-            for item in walk(path):
-                for file in item[2]:
-                    try:
-                        total_size = total_size + getsize(join(item[0], file))
-                    except (OSError, PermissionError) as folder_size_e:
-                        self.log("error with file:  " + join(item[0], file), folder_size_e)
+            folders = [path]
+            while folders:
+                folder = folders.pop()
+                try:
+                    entries = scandir(folder)
+                except OSError as folder_size_e:
+                    self.log("error with folder:  " + folder, folder_size_e)
+                    continue
+
+                with entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                folders.append(entry.path)
+                            else:
+                                total_size += entry.stat(follow_symlinks=False).st_size
+                        except OSError as folder_size_e:
+                            self.log("error with file:  " + entry.path, folder_size_e)
             return total_size
 
-
         total = 0
 
         for name, checkpoint in self.config.locations.items():
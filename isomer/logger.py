@@ -142,6 +142,15 @@ def get_verbosity():
     return verbosity
 
 
+def is_enabled(lvl: int) -> bool:
+    """Check if messages of a given level would be logged at all
+
+    Use this to guard log calls whose arguments are expensive to assemble.
+    """
+
+    return lvl >= verbosity["global"]
+
+
 def set_logfile(path: str, instance: str, filename: str = None):
     """
     Specify logfile path
@@ -87,16 +87,11 @@ def provisionList(
 
         return False
 
-    import pymongo
-    from isomer.database import objectmodels, dbhost, dbport, dbname
+    from isomer.database import objectmodels, dbhost, dbname, db
 
     database_object = objectmodels[database_name]
 
     log(dbhost, dbname)
-    # TODO: Fix this to make use of the dbhost
-
-    client = pymongo.MongoClient(dbhost, dbport)
-    db = client[dbname]
 
     if not skip_user_check:
         system_user = get_system_user()
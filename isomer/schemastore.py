@@ -20,15 +20,23 @@
 
 """Schemastore builder"""
 
+import os
+import hashlib
+import importlib.util
+
 import formal
 import jsonschema
 
 from copy import deepcopy
-from pkg_resources import iter_entry_points, DistributionNotFound
-from json import dumps
+from json import dumps, load, loads
+
+try:
+    from importlib.metadata import entry_points, PackageNotFoundError
+except ImportError:
+    from importlib_metadata import entry_points, PackageNotFoundError
 
 from isomer.logger import isolog, verbose, warn, debug
-from isomer.misc import all_languages, i18n as _
+from isomer.misc import all_languages, localedir, i18n as _
 
 
 def schemata_log(*args, **kwargs):
@@ -43,15 +51,144 @@ restrictions = {}
 configschemastore = {}
 
 
-def build_schemastore_new():
+def _schema_entrypoints():
+    """Get all registered schemata entrypoints without touching pkg_resources"""
+
+    all_entrypoints = entry_points()
+
+    if hasattr(all_entrypoints, "select"):
+        return all_entrypoints.select(group="isomer.schemata")
+
+    return all_entrypoints.get("isomer.schemata", [])
+
+
+def _schemastore_cache_key(schema_entrypoints):
+    """Fingerprint the schema entrypoints and their packages' sources to detect
+    changes"""
+
+    fingerprint = []
+    package_paths = set()
+
+    for schema_entrypoint in schema_entrypoints:
+        fingerprint.append((schema_entrypoint.name, schema_entrypoint.value))
+
+        module_name = schema_entrypoint.value.split(":")[0]
+        try:
+            origin = importlib.util.find_spec(module_name).origin
+            package_paths.add(os.path.dirname(origin))
+        except (ImportError, AttributeError, TypeError, ValueError):
+            fingerprint.append((module_name, None))
+
+    # Schemata import helpers from their packages, any change there counts
+    for package_path in sorted(package_paths):
+        try:
+            with os.scandir(package_path) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(".py"):
+                        fingerprint.append((entry.path, entry.stat().st_mtime_ns))
+        except OSError:
+            fingerprint.append((package_path, None))
+
+    # Language fields enumerate the available translations
+    try:
+        fingerprint.append((localedir, sorted(os.listdir(localedir))))
+        languages_file = os.path.join(localedir, "languages.json")
+        fingerprint.append((languages_file, os.stat(languages_file).st_mtime_ns))
+    except OSError:
+        fingerprint.append((localedir, None))
+
+    fingerprint.sort(key=repr)
+
+    return hashlib.sha1(repr(fingerprint).encode("utf-8")).hexdigest()
+
+
+def _schemastore_cache_filename(key):
+    """Return the instance specific filename of a cached schemastore"""
+
+    from isomer.misc.path import get_path
+
+    return os.path.join(get_path("cache", "schemastore"), "schemastore-%s.json" % key)
+
+
+def _load_schemastore_cache(key):
+    """Load a previously built schemastore and its field restrictions from disk"""
+
+    filename = _schemastore_cache_filename(key)
+
+    try:
+        with open(filename, "r") as f:
+            cached = load(f)
+        available = cached["schemastore"]
+        cached_restrictions = cached["restrictions"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        schemata_log("Could not read schemastore cache:", filename, e, lvl=warn)
+        return None
+
+    schemata_log("Using cached schemastore", filename, lvl=debug)
+    restrictions.update(cached_restrictions)
+
+    return available
+
+
+def _store_schemastore_cache(key, available):
+    """Store a freshly built schemastore and its field restrictions on disk"""
+
+    filename = _schemastore_cache_filename(key)
+    cached = {"schemastore": available, "restrictions": dict(restrictions)}
+
+    try:
+        serialized = dumps(cached)
+    except (TypeError, ValueError) as e:
+        schemata_log("Schemastore can't be cached:", e, lvl=debug)
+        return
+
+    # Only cache what survives the round trip unchanged, e.g. no tuples
+    if loads(serialized) != cached:
+        schemata_log("Schemastore can't be cached losslessly", lvl=debug)
+        return
+
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename + ".tmp", "w") as f:
+            f.write(serialized)
+        os.replace(filename + ".tmp", filename)
+    except OSError as e:
+        schemata_log("Could not write schemastore cache:", filename, e, lvl=debug)
+
+
+def build_schemastore_new(use_cache=True):
+    """Build the schemastore from all registered schemata entrypoints
+
+    The result is cached on disk per instance and reused as long as neither the
+    registered schemata nor the sources of their packages change.
+    """
+
+    schema_entrypoints = list(_schema_entrypoints())
+
+    if not use_cache:
+        return _build_schemastore(schema_entrypoints)
+
+    key = _schemastore_cache_key(schema_entrypoints)
+    available = _load_schemastore_cache(key)
+
+    if available is None:
+        available = _build_schemastore(schema_entrypoints)
+        _store_schemastore_cache(key, available)
+
+    return available
+
+
+def _build_schemastore(schema_entrypoints):
     available = {}
 
-    for schema_entrypoint in iter_entry_points(group="isomer.schemata", name=None):
+    for schema_entrypoint in schema_entrypoints:
         try:
             schemata_log("Schemata found: ", schema_entrypoint.name, lvl=verbose)
             schema = schema_entrypoint.load()
             available[schema_entrypoint.name] = schema
-        except (ImportError, DistributionNotFound) as e:
+        except (ImportError, AttributeError, PackageNotFoundError) as e:
             schemata_log(
                 "Problematic schema: ", schema_entrypoint.name, exc=True, lvl=warn
             )
@@ -223,10 +360,14 @@ def build_l10n_schemastore(available):
 def test_schemata():
     """Validates all registered schemata"""
 
+    from isomer.database import cached_model_factory
+
     objects = {}
 
     for schemaname in schemastore.keys():
-        objects[schemaname] = formal.model_factory(schemastore[schemaname]["schema"])
+        objects[schemaname] = cached_model_factory(
+            schemastore[schemaname]["schema"], formal.formalModel
+        )
         try:
             testobject = objects[schemaname]()
             testobject.validate()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# Isomer - The distributed application framework
+# ==============================================
+# Copyright (C) 2011-2020 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+
+Module: Compiled validators
+===========================
+
+Holds validator modules generated from object schemata by
+
+    iso dev compile-validators
+
+Every generated module records a digest of the schema it was generated
+from, so outdated modules are ignored instead of validating against an
+old schema.
+
+"""
+
+import hashlib
+import json
+from importlib import import_module
+
+
+def canonical_json(schema):
+    """Get a schema's JSON representation with a stable key order"""
+
+    return json.dumps(schema, sort_keys=True, default=str)
+
+
+def schema_digest(schema):
+    """Get a stable digest of a schema's canonical JSON representation"""
+
+    return hashlib.sha1(canonical_json(schema).encode("utf-8")).hexdigest()
+
+
+def load_validator(name, schema):
+    """Return the generated validator for a schema, if it is up to date"""
+
+    try:
+        module = import_module(__name__ + "." + name)
+    except ImportError:
+        return None
+
+    if getattr(module, "SCHEMA_DIGEST", None) != schema_digest(schema):
+        return None
+
+    return module.validate
@@ -34,8 +34,28 @@ base_object: For generating a basic Isomer object schema
 
 """
 
+import re
+from functools import lru_cache
+
 from isomer.misc import all_languages
 
+# Digits are spelled out as [0-9], so the patterns only match ASCII digits,
+# like JSON schema's ECMA 262 flavour of \d
+_UUID_RE = re.compile(
+    r"^[a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]"
+    r"{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12}$"
+)
+_LAT_RE = re.compile(r"^[-+]?([1-8]?[0-9](\.[0-9]+)?|90(\.0+)?)$")
+_LON_RE = re.compile(
+    r"^[-+]?(180(\.0+)?|((1[0-7][0-9])|([1-9]?[0-9]))(\.[0-9]+)?)$"
+)
+
+# Compiled patterns by their source text, consulted by validators before
+# compiling a schema's pattern themselves
+pattern_cache = {
+    regex.pattern: regex for regex in (_UUID_RE, _LAT_RE, _LON_RE)
+}
+
 
 def geo_coordinate(
         title="Coordinate", description="A coordinate", default=None, display=True
@@ -50,13 +70,13 @@ def geo_coordinate(
         "properties": {
             'lat': {
                 'type': 'string',
-                'pattern': "^[-+]?([1-8]?\d(\.\d+)?|90(\.0+)?)$",
+                'pattern': _LAT_RE.pattern,
                 'title': 'Latitude',
                 'description': 'From 90 Degrees North (+) to South (-)'
             },
             'lon': {
                 'type': 'string',
-                'pattern': '^[-+]?(180(\.0+)?|((1[0-7]\d)|([1-9]?\d))(\.\d+)?)$',
+                'pattern': _LON_RE.pattern,
                 'title': 'Longitude',
                 'description': 'From 180 Degrees East (+) to West (-)'
             }
@@ -78,8 +98,7 @@ def uuid_object(
     """Generates a regular expression controlled UUID field"""
 
     uuid = {
-        "pattern": "^[a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]"
-                   "{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12}$",
+        "pattern": _UUID_RE.pattern,
         "type": "string",
         "title": title,
         "description": description,
@@ -139,6 +158,12 @@ def base_object(
         if isinstance(roles_list, str):
             roles_list = [roles_list]
 
+        # Work on copies, the caller's role lists are not ours to change
+        roles_create = list(roles_create)
+        roles_write = list(roles_write)
+        roles_read = list(roles_read)
+        roles_list = list(roles_list)
+
         if has_owner:
             roles_write.append("owner")
             roles_read.append("owner")
@@ -215,10 +240,17 @@ def sql_object(*args, **kwargs):
     return base_schema
 
 
+@lru_cache(maxsize=1)
+def _cached_languages():
+    """Look the available translations up only once"""
+
+    return tuple(all_languages())
+
+
 def language_field():
     schema = {
         "type": "string",
-        "enum": all_languages(),
+        "enum": list(_cached_languages()),
         "title": "Language",
         "description": "Select a language",
     }
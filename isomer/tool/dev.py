@@ -34,6 +34,7 @@ import click
 import os
 import shutil
 import json
+import re
 
 from pprint import pprint
 from click_didyoumean import DYMGroup
@@ -42,7 +43,7 @@ from operator import attrgetter
 
 from isomer.tool import log, ask, run_process, finish
 from isomer.tool.templates import write_template_file
-from isomer.logger import debug, verbose, warn
+from isomer.logger import debug, verbose, warn, error
 from isomer.misc.std import std_table
 from isomer.error import abort
 from isomer.ui.store.inventory import populate_store, get_inventory
@@ -320,6 +321,57 @@ def export_schemata(ctx, output_path, output_format, no_entity_mode, include_met
     finish(ctx)
 
 
+@dev.command(short_help="compile schema validators")
+@click.argument("schemata", nargs=-1)
+@click.pass_context
+def compile_validators(ctx, schemata):
+    """Generate validator modules for object schemata
+
+    The generated modules are used by the object validation tools instead
+    of compiling validators at runtime. This requires "fastjsonschema".
+    """
+
+    try:
+        import fastjsonschema
+    except ImportError:
+        log("Compiling validators requires fastjsonschema.", lvl=error)
+        return
+
+    from isomer import database
+    from isomer.schemata import _compiled
+
+    database.initialize(ctx.obj["dbhost"], ctx.obj["dbname"], ignore_fail=True)
+
+    if len(schemata) == 0:
+        schemata = list(database.objectmodels.keys())
+
+    output_path = os.path.dirname(_compiled.__file__)
+
+    for item in schemata:
+        if item not in database.objectmodels:
+            log("Schema not registered:", item, lvl=warn)
+            continue
+
+        schema = database.objectmodels[item]._schema
+
+        try:
+            code = fastjsonschema.compile_to_code(schema, use_default=False)
+        except fastjsonschema.JsonSchemaDefinitionException as e:
+            log("Cannot compile schema", item, ":", e, lvl=warn)
+            continue
+
+        log("Writing validator for", item)
+        with open(os.path.join(output_path, item + ".py"), "w") as f:
+            f.write("# Generated by 'iso dev compile-validators', do not edit.\n")
+            f.write('SCHEMA_DIGEST = "%s"\n\n' % _compiled.schema_digest(schema))
+            f.write(code)
+            # The root validator is generated first, named after the schema id
+            root = re.search(r"^def (\w+)\(", code, re.MULTILINE).group(1)
+            f.write("\n\nvalidate = %s\n" % root)
+
+    finish(ctx)
+
+
 @dev.command(short_help="create starterkit module")
 @click.option(
     "--clear-target",
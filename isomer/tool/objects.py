@@ -28,18 +28,158 @@ Object management functionality and utilities.
 
 """
 
+import json
+import re
+import sys
 from ast import literal_eval
+from functools import lru_cache
 from pprint import pprint
 
 import bson
+from pymongo import DeleteOne, ReplaceOne
 import deepdiff
 import click
 from click_didyoumean import DYMGroup
+from jsonschema.exceptions import ValidationError
+from jsonschema.validators import extend, validator_for
 
 from isomer.logger import error, debug, warn, verbose
+from isomer.schemata.base import pattern_cache
+from isomer.schemata._compiled import canonical_json, load_validator
 from isomer.tool import log, ask, finish
 from isomer.tool.database import db
 
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+# Optional, installed with the 'json' extra like for the client encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _cached_pattern(validator, pattern, instance, schema):
+    """Pattern keyword, that looks up precompiled expressions first"""
+
+    if not validator.is_type(instance, "string"):
+        return
+
+    regex = pattern_cache.get(pattern)
+    if regex is None:
+        regex = pattern_cache.setdefault(pattern, re.compile(pattern))
+
+    if not regex.search(instance):
+        yield ValidationError("%r does not match %r" % (instance, pattern))
+
+
+@lru_cache(maxsize=256)
+def _compile_validator(canonical):
+    """Build a validating function for a schema's canonical JSON
+    representation, so equal schemata share one validator.
+
+    Uses fastjsonschema and falls back to a checked jsonschema validator
+    instance, if fastjsonschema is not available or cannot handle the
+    schema."""
+
+    schema = json.loads(canonical)
+
+    if fastjsonschema is not None:
+        try:
+            return fastjsonschema.compile(schema, use_default=False)
+        except fastjsonschema.JsonSchemaDefinitionException as e:
+            log("Cannot compile schema", schema.get("name"), ":", e, lvl=debug)
+
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    cls = extend(cls, {"pattern": _cached_pattern})
+
+    return cls(schema).validate
+
+
+def _get_validator(schema_name, schema):
+    """Get a validating function for a schema, preferring an up to date
+    pregenerated validator module"""
+
+    if fastjsonschema is not None:
+        validator = load_validator(schema_name, schema)
+        if validator is not None:
+            return validator
+
+    return _compile_validator(canonical_json(schema))
+
+
+def _validate_fields(fields, validator):
+    """Validate an object's fields with a prepared validator"""
+
+    fields = dict(fields)
+    # Schemata know nothing about mongodb's object ids
+    fields.pop("_id", None)
+    validator(fields)
+
+
+def _shallow_diff(a, b, path=""):
+    """List (key, value a, value b) for all differing fields of two dicts,
+    descending only into nested dicts"""
+
+    result = []
+    for key in sorted(set(a) | set(b), key=str):
+        value_a = a.get(key)
+        value_b = b.get(key)
+        if value_a == value_b:
+            continue
+
+        key_path = path + str(key)
+        if isinstance(value_a, dict) and isinstance(value_b, dict):
+            result.extend(_shallow_diff(value_a, value_b, key_path + "."))
+        else:
+            result.append((key_path, value_a, value_b))
+
+    return result
+
+
+def _object_query(uuid, object_filter):
+    """Build a query from an object uuid or a literal filter expression"""
+
+    if uuid:
+        return {"uuid": uuid}
+    if object_filter:
+        return literal_eval(object_filter)
+    return {}
+
+
+def _find_fields(schema, search, by_type=False):
+    """Examine a schema and its subschemata to find fields by type or name"""
+
+    def walk(search_schema, key, seen):
+        """Yield hits of a (sub)schema, visiting every schema only once"""
+
+        if id(search_schema) in seen:
+            return
+        seen.add(id(search_schema))
+
+        fields = search_schema.get("properties", {})
+        if not by_type and search in fields:
+            yield key
+
+        for field, definition in fields.items():
+            if not isinstance(definition, dict):
+                continue
+
+            if by_type and definition.get("type") == search:
+                yield key, field
+
+            if "properties" in definition:
+                yield from walk(definition, field, seen)
+
+            items = definition.get("items")
+            if isinstance(items, dict) and "properties" in items:
+                yield from walk(items, field, seen)
+
+    return list(walk(schema, "top", set()))
+
 
 @db.group(
     cls=DYMGroup,
@@ -84,7 +224,7 @@ def modify(ctx, schema, uuid, object_filter, field, value):
         new_value = str(value)
 
     obj._fields[field] = new_value
-    obj.validate()
+    _validate_fields(obj._fields, _get_validator(schema, model._schema))
     log("Changed object validated", lvl=debug)
     obj.save()
     finish(ctx)
@@ -106,18 +246,29 @@ def view(ctx, schema, uuid, object_filter):
 
     model = database.objectmodels[schema]
 
-    if uuid:
-        obj = model.find({"uuid": uuid})
-    elif object_filter:
-        obj = model.find(literal_eval(object_filter))
-    else:
-        obj = model.find()
+    query = _object_query(uuid, object_filter)
+    obj = model.find(query)
 
-    if obj is None or model.count() == 0:
+    if model.count(query) == 0:
         log("No objects found.", lvl=warn)
 
-    for item in obj:
-        pprint(item._fields)
+    if orjson is None:
+        for item in obj:
+            pprint(item._fields)
+    else:
+        options = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        # Don't let pending text output interleave with the binary stream
+        sys.stdout.flush()
+        output = click.get_binary_stream("stdout")
+        for item in obj:
+            try:
+                output.write(orjson.dumps(item._fields, default=str, option=options))
+                output.write(b"\n")
+            except TypeError:
+                output.flush()
+                pprint(item._fields)
+                sys.stdout.flush()
+        output.flush()
 
     finish(ctx)
 
@@ -141,15 +292,12 @@ def delete(ctx, schema, uuid, object_filter, yes):
 
     model = database.objectmodels[schema]
 
-    if uuid:
-        count = model.count({"uuid": uuid})
-        obj = model.find({"uuid": uuid}, validation=False)
-    elif object_filter:
-        count = model.count(literal_eval(object_filter))
-        obj = model.find(literal_eval(object_filter), validation=False)
+    query = _object_query(uuid, object_filter)
+    if yes and not query:
+        # Nobody is asked to confirm an exact number
+        count = model.collection().estimated_document_count()
     else:
-        count = model.count()
-        obj = model.find(validation=False)
+        count = model.count(query)
 
     if count == 0:
         log("No objects to delete found")
@@ -163,8 +311,8 @@ def delete(ctx, schema, uuid, object_filter, yes):
     ):
         return
 
-    for item in obj:
-        item.delete()
+    result = model.collection().delete_many(query)
+    log("Deleted %i objects" % result.deleted_count)
 
     finish(ctx)
 
@@ -218,18 +366,24 @@ def validate(ctx, schema, all_schemata):
             log("No schema given. Read the help", lvl=warn)
             return
         else:
-            schemata = database.objectmodels.keys()
+            schemata = list(database.objectmodels.keys())
     else:
         schemata = [schema]
 
     for schema in schemata:
         try:
             things = database.objectmodels[schema]
+            validator = _get_validator(schema, things._schema)
+            # Validate the raw documents, hydrating model objects would
+            # validate every one of them a second time
+            documents = things.collection().find().batch_size(1000)
             with click.progressbar(
-                things.find(), length=things.count(), label="Validating %15s" % schema
+                documents,
+                length=things.collection().estimated_document_count(),
+                label="Validating %15s" % schema,
             ) as object_bar:
-                for obj in object_bar:
-                    obj.validate()
+                for document in object_bar:
+                    _validate_fields(document, validator)
         except Exception as e:
 
             log(
@@ -260,59 +414,14 @@ def validate(ctx, schema, all_schemata):
 def find_field(ctx, search, by_type, obj):
     """Find fields in registered data models."""
 
-    # TODO: Fix this to work recursively on all possible subschemes
     if search is None:
         search = ask("Enter search term")
 
     database = ctx.obj["db"]
 
-    def find(search_schema, search_field, find_result=None, key=""):
-        """Examine a schema to find fields by type or name"""
-
-        if find_result is None:
-            find_result = []
-        fields = search_schema["properties"]
-        if not by_type:
-            if search_field in fields:
-                find_result.append(key)
-                # log("Found queried fieldname in ", model)
-        else:
-            for field in fields:
-                try:
-                    if "type" in fields[field]:
-                        # log(fields[field], field)
-                        if fields[field]["type"] == search_field:
-                            find_result.append((key, field))
-                            # log("Found field", field, "in", model)
-                except KeyError as e:
-                    log("Field access error:", e, type(e), exc=True, lvl=debug)
-
-        if "properties" in fields:
-            # log('Sub properties checking:', fields['properties'])
-            find_result.append(
-                find(
-                    fields["properties"], search_field, find_result, key=fields["name"]
-                )
-            )
-
-        for field in fields:
-            if "items" in fields[field]:
-                if "properties" in fields[field]["items"]:
-                    # log('Sub items checking:', fields[field])
-                    find_result.append(
-                        find(
-                            fields[field]["items"], search_field, find_result, key=field
-                        )
-                    )
-                else:
-                    pass
-                    # log('Items without proper definition!')
-
-        return find_result
-
     if obj is not None:
         schema = database.objectmodels[obj]._schema
-        result = find(schema, search, [], key="top")
+        result = _find_fields(schema, search, by_type)
         if result:
             # log(args.object, result)
             print(obj)
@@ -321,7 +430,7 @@ def find_field(ctx, search, by_type, obj):
         for model, thing in database.objectmodels.items():
             schema = thing._schema
 
-            result = find(schema, search, [], key="top")
+            result = _find_fields(schema, search, by_type)
             if result:
                 print(model)
                 # log(model, result)
@@ -360,29 +469,49 @@ def illegalcheck(ctx, schema, delete_duplicates, fix, test):
         return
 
     if schema is None:
-        schemata = database.objectmodels.keys()
+        schemata = list(database.objectmodels.keys())
     else:
         schemata = [schema]
 
+    ObjectId = bson.objectid.ObjectId
+
     for thing in schemata:
         log("Schema:", thing)
-        for item in database.objectmodels[thing].find():
-            if not isinstance(item._fields["_id"], bson.objectid.ObjectId):
-                if not delete_duplicates:
-                    log(item.uuid)
-                    log(item._fields, pretty=True, lvl=verbose)
-                if test:
-                    if database.objectmodels[thing].count({"uuid": item.uuid}) == 1:
-                        log("Only a faulty object exists.")
-                if delete_duplicates:
-                    item.delete()
-                if fix:
-                    _id = item._fields["_id"]
-                    item._fields["_id"] = bson.objectid.ObjectId(_id)
-                    if not isinstance(item._fields["_id"], bson.objectid.ObjectId):
-                        log("Object mongo ID field not valid!", lvl=warn)
-                    item.save()
-                    database.objectmodels[thing].find_one({"_id": _id}).delete()
+        model = database.objectmodels[thing]
+        collection = model.collection()
+        documents = (
+            collection.find(projection={"_id": 1, "uuid": 1}).batch_size(1000)
+        )
+        operations = []
+        for document in documents:
+            _id = document["_id"]
+            if isinstance(_id, ObjectId):
+                continue
+
+            # Only faulty objects get loaded completely, as raw documents:
+            # Model objects would validate the very data we're examining
+            fields = collection.find_one({"_id": _id})
+            uuid = fields.get("uuid")
+            if not delete_duplicates:
+                log(uuid)
+                log(fields, pretty=True, lvl=verbose)
+            if test:
+                if model.count({"uuid": uuid}) == 1:
+                    log("Only a faulty object exists.")
+            if delete_duplicates:
+                operations.append(DeleteOne({"_id": _id}))
+            if fix:
+                fields["_id"] = ObjectId(_id)
+                operations.append(
+                    ReplaceOne({"_id": fields["_id"]}, fields, upsert=True)
+                )
+                operations.append(DeleteOne({"_id": _id}))
+            if len(operations) >= 1000:
+                collection.bulk_write(operations, ordered=False)
+                operations = []
+
+        if operations:
+            collection.bulk_write(operations, ordered=False)
     finish(ctx)
 
 
@@ -397,23 +526,42 @@ def illegalcheck(ctx, schema, delete_duplicates, fix, test):
 @click.option(
     "--do-merge", "--merge", default=False, is_flag=True, help="Merge found duplicates"
 )
+@click.option(
+    "--deep",
+    default=False,
+    is_flag=True,
+    help="Show full DeepDiff output, including list index changes",
+)
 @click.option("--schema", default=None, help="Work on specified schema only")
 @click.pass_context
-def dupcheck(ctx, delete_duplicates, do_merge, schema):
+def dupcheck(ctx, delete_duplicates, do_merge, deep, schema):
     """Tool to check for duplicate objects. Which should never happen."""
 
     def handle_schema(check_schema):
         dupes = {}
+
+        model = database.objectmodels[check_schema]
+        collection = model.collection()
+        count = collection.estimated_document_count()
+
+        # Let the database group by uuid, only duplicated objects get fetched
+        groups = collection.aggregate(
+            [
+                {"$group": {"_id": "$uuid", "count": {"$sum": 1}}},
+                {"$match": {"count": {"$gt": 1}}},
+            ],
+            allowDiskUse=True,
+        )
+
+        dupe_uuids = []
         dupe_count = 0
-        count = 0
+        for group in groups:
+            dupe_uuids.append(group["_id"])
+            dupe_count += group["count"] - 1
 
-        for item in database.objectmodels[check_schema].find():
-            if item.uuid in dupes:
-                dupes[item.uuid].append(item)
-                dupe_count += 1
-            else:
-                dupes[item.uuid] = [item]
-            count += 1
+        # Raw documents, model objects would validate every candidate
+        for document in collection.find({"uuid": {"$in": dupe_uuids}}):
+            dupes.setdefault(document["uuid"], []).append(document)
 
         if len(dupes) > 0:
             log(
@@ -428,8 +576,12 @@ def dupcheck(ctx, delete_duplicates, do_merge, schema):
 
         if delete_duplicates:
             log("Deleting duplicates")
-            for item in dupes:
-                database.objectmodels[check_schema].find_one({"uuid": item}).delete()
+            # Keep the first object of every uuid, remove all other copies
+            extras = [
+                dupe["_id"] for candidates in dupes.values() for dupe in candidates[1:]
+            ]
+            if extras:
+                collection.delete_many({"_id": {"$in": extras}})
 
             log("Done for schema", check_schema)
         elif do_merge:
@@ -468,7 +620,7 @@ def dupcheck(ctx, delete_duplicates, do_merge, schema):
                     log(len(dupes[item]), "duplicates found:")
                     for index, dupe in enumerate(dupes[item]):
                         log("Candidate #", index, ":")
-                        log(dupe._fields, pretty=True)
+                        log(dupe, pretty=True)
                     request = ask("(d)iff, (m)erge, (r)emove, (i)gnore, (q)uit?")
                     if request == "q":
                         log("Done")
@@ -490,7 +642,9 @@ def dupcheck(ctx, delete_duplicates, do_merge, schema):
                             continue
                         else:
                             log("Deleting candidate #", delete_request)
-                            dupes[item][delete_request].delete()
+                            collection.delete_one(
+                                {"_id": dupes[item][delete_request]["_id"]}
+                            )
                             break
                     elif request in ("d", "m"):
                         merge_request_a = -2
@@ -518,13 +672,16 @@ def dupcheck(ctx, delete_duplicates, do_merge, schema):
                         if merge_request_b == -1:
                             continue
 
-                        log(
-                            deepdiff.DeepDiff(
-                                dupes[item][merge_request_a]._fields,
-                                dupes[item][merge_request_b]._fields,
-                            ),
-                            pretty=True,
-                        )
+                        fields_a = dupes[item][merge_request_a]
+                        fields_b = dupes[item][merge_request_b]
+
+                        # Duplicates always differ in their database id
+                        if dict(fields_a, _id=None) == dict(fields_b, _id=None):
+                            log("Candidates are identical")
+                        elif deep:
+                            log(deepdiff.DeepDiff(fields_a, fields_b), pretty=True)
+                        else:
+                            log(_shallow_diff(fields_a, fields_b), pretty=True)
 
                         if request == "m":
                             log(
@@ -534,34 +691,47 @@ def dupcheck(ctx, delete_duplicates, do_merge, schema):
                                 merge_request_b,
                             )
 
-                            _id = dupes[item][merge_request_b]._fields["_id"]
+                            old_ids = [fields_a["_id"], fields_b["_id"]]
+                            _id = fields_b["_id"]
                             if not isinstance(_id, bson.objectid.ObjectId):
                                 _id = bson.objectid.ObjectId(_id)
 
-                            dupes[item][merge_request_a]._fields["_id"] = _id
-                            merge(
-                                dupes[item][merge_request_b]._fields,
-                                dupes[item][merge_request_a]._fields,
-                            )
+                            fields_a["_id"] = fields_b["_id"] = _id
+                            merge(fields_b, fields_a)
 
-                            log(
-                                "Candidate after merge:",
-                                dupes[item][merge_request_b]._fields,
-                                pretty=True,
-                            )
+                            log("Candidate after merge:", fields_b, pretty=True)
 
                             store = ""
                             while store not in ("n", "y"):
                                 store = ask("Store?")
                             if store == "y":
-                                dupes[item][merge_request_b].save()
-                                dupes[item][merge_request_a].delete()
+                                try:
+                                    _validate_fields(
+                                        fields_b,
+                                        _get_validator(check_schema, model._schema),
+                                    )
+                                except Exception as e:
+                                    log(
+                                        "Merged candidate is invalid, not storing:",
+                                        e,
+                                        lvl=error,
+                                    )
+                                    fields_a["_id"], fields_b["_id"] = old_ids
+                                    continue
+
+                                collection.replace_one(
+                                    {"_id": _id}, fields_b, upsert=True
+                                )
+                                collection.delete_many(
+                                    {"_id": {"$in": [i for i in old_ids if i != _id]}}
+                                )
                                 break
+                            fields_a["_id"], fields_b["_id"] = old_ids
 
     database = ctx.obj["db"]
 
     if schema is None:
-        schemata = database.objectmodels.keys()
+        schemata = list(database.objectmodels.keys())
     else:
         schemata = [schema]
 
@@ -33,11 +33,16 @@ Contains system setup tasks.
 """
 
 import os
+import re
 import time
 import click
 import shutil
+import shlex
 import pwd
+import grp
 
+from functools import lru_cache
+from pathlib import Path
 from click_didyoumean import DYMGroup
 from tomlkit import loads, dumps
 from tomlkit.exceptions import NonExistentKey
@@ -226,34 +231,64 @@ def system_user(ctx):
     finish(ctx)
 
 
+@lru_cache(maxsize=None)
+def _isomer_pw():
+    """Look up the isomer system user's passwd entry once"""
+
+    return pwd.getpwnam("isomer")
+
+
 def _add_system_user(use_sudo=False):
     """instance Isomer system user (isomer.isomer)"""
 
-    command = [
-        "/usr/sbin/adduser",
-        "--system",
-        "--quiet",
-        "--home",
-        "/var/run/isomer",
-        "--group",
-        "--disabled-password",
-        "--disabled-login",
-        "isomer",
-    ]
+    try:
+        _isomer_pw()
+        user_exists = True
+    except KeyError:
+        user_exists = False
+
+    if not user_exists:
+        command = [
+            "/usr/sbin/adduser",
+            "--system",
+            "--quiet",
+            "--home",
+            "/var/run/isomer",
+            "--group",
+            "--disabled-password",
+            "--disabled-login",
+            "isomer",
+        ]
+
+        success, output = run_process("/", command, sudo=use_sudo)
+        if success is False:
+            log("Error adding system user:", lvl=error)
+            log(output, lvl=error)
+
+        _isomer_pw.cache_clear()
 
-    success, output = run_process("/", command, sudo=use_sudo)
-    if success is False:
-        log("Error adding system user:", lvl=error)
-        log(output, lvl=error)
+    try:
+        in_dialout = "isomer" in grp.getgrnam("dialout").gr_mem
+    except KeyError:
+        in_dialout = False
 
-    command = ["/usr/sbin/adduser", "isomer", "dialout"]
+    if not in_dialout:
+        command = ["/usr/sbin/adduser", "isomer", "dialout"]
 
-    success, output = run_process("/", command, sudo=use_sudo)
-    if success is False:
-        log("Error adding system user to dialout group:", lvl=error)
-        log(output, lvl=error)
+        success, output = run_process("/", command, sudo=use_sudo)
+        if success is False:
+            log("Error adding system user to dialout group:", lvl=error)
+            log(output, lvl=error)
 
-    time.sleep(2)
+    if not user_exists:
+        # Wait (at most two seconds) until the new user is visible
+        deadline = time.monotonic() + 2.0
+        while time.monotonic() < deadline:
+            try:
+                _isomer_pw()
+                break
+            except KeyError:
+                time.sleep(0.05)
 
 
 @system.command(name="paths", short_help="create system paths")
@@ -277,13 +312,21 @@ def _create_system_folders(use_sudo=False):
 
     target_paths.append(get_log_path())
 
-    for item in target_paths:
-        run_process("/", ["sudo", "mkdir", "-p", item], sudo=use_sudo)
-        run_process("/", ["sudo", "chown", "isomer", item], sudo=use_sudo)
+    paths = " ".join(shlex.quote(item) for item in target_paths)
+    log_path = shlex.quote(get_log_path())
 
-    # TODO: The group/ownership should be assigned per instance.user/group
-    run_process("/", ["sudo", "chgrp", "isomer", "/var/log/isomer"], sudo=use_sudo)
-    run_process("/", ["sudo", "chmod", "g+w", "/var/log/isomer"], sudo=use_sudo)
+    script = " && ".join([
+        "mkdir -p " + paths,
+        "chown isomer " + paths,
+        # TODO: The group/ownership should be assigned per instance.user/group
+        "chgrp isomer " + log_path,
+        "chmod g+w " + log_path,
+    ])
+
+    success, output = run_process("/", ["sh", "-c", script], sudo=use_sudo)
+    if success is False:
+        log("Error creating system folders:", lvl=error)
+        log(output, lvl=error)
 
 
 @system.command(short_help="Remove all instance data")
@@ -316,41 +359,77 @@ def check(ctx, acknowledge):
 
     log("Checking etc in '%s' and prefix in '%s'" % (etc_path, prefix_path))
 
-    def check_exists(path):
-        if not os.path.exists(path):
+    checked_locations = (
+        (etc_path, ''),
+        (etc_path, 'isomer.conf'),
+        (etc_path, 'instances'),
+        (prefix_path, 'var/lib/isomer'),
+        (prefix_path, 'var/local/isomer'),
+        (prefix_path, 'var/cache/isomer'),
+        (prefix_path, 'var/log/isomer'),
+        (prefix_path, 'var/run/isomer'),
+        (prefix_path, 'var/backups/isomer'),
+        (prefix_path, 'var/www/challenges'),
+    )
+
+    # Every distinct location is only looked at once
+    paths = (os.path.join(base, location) for base, location in checked_locations)
+    for path in dict.fromkeys(paths):
+        try:
+            os.stat(path)
+        except FileNotFoundError:
+            log("Location '%s' does not exist" % path, lvl=warn)
+            continue
+        except PermissionError:
+            log("No permission to check location '%s'" % path, lvl=warn)
+            continue
+        except OSError:
+            # E.g. a broken mount or a path component that is not a folder
             log("Location '%s' does not exist" % path, lvl=warn)
-        elif acknowledge:
+            continue
+        if acknowledge:
             log("Location '%s' exists" % path)
 
-    locations_etc = [
-        '',
-        'isomer.conf',
-        'instances'
-    ]
-
-    locations_prefix = [
-        'var/lib/isomer',
-        'var/local/isomer',
-        'var/cache/isomer',
-        'var/log/isomer',
-        'var/run/isomer',
-        'var/backups/isomer',
-        'var/www/challenges'
-    ]
-
-    for location in locations_etc:
-        check_exists(os.path.join(etc_path, location))
-    for location in locations_prefix:
-        check_exists(os.path.join(prefix_path, location))
-
     try:
-        pwd.getpwnam("isomer")
+        _isomer_pw()
         log("Isomer user exists")
     except KeyError:
         log("Isomer user does not exist", lvl=warn)
 
 
 
+def _apply_renames(configuration, renames):
+    """Apply one upgrade step's renames to a serialized configuration
+
+    All renames of a step are applied in a single pass, where the longest
+    matching name wins, so a replacement is never renamed again. The first rename
+    of a name wins and exact chains within the step (a -> b, b -> c) are
+    resolved. Unlike sequential replaces, a shorter name is not replaced inside
+    a longer one that is renamed itself.
+    """
+
+    mapping = {}
+    for old_name, new_name in renames:
+        if old_name in mapping:
+            continue
+        for source, target in mapping.items():
+            if target == old_name:
+                mapping[source] = new_name
+        mapping[old_name] = new_name
+
+    if not mapping:
+        return configuration
+
+    for old_name, new_name in mapping.items():
+        log("Renaming", old_name, new_name)
+
+    # Longest names first, so prefixes don't shadow longer names
+    pattern = re.compile(
+        "|".join(re.escape(name) for name in sorted(mapping, key=len, reverse=True))
+    )
+    return pattern.sub(lambda match: mapping[match.group(0)], configuration)
+
+
 @system.command(help="(WiP!) Upgrade older configuration files to the current version")
 @click.argument("filename")
 @click.pass_context
@@ -360,8 +439,8 @@ def upgrade(ctx, filename):
     log("You'll have to implement these manually, until this function is developed "
         "completely!", lvl=warn)
 
-    with open(filename, 'r') as f:
-        old_configuration = loads(f.read())
+    raw_configuration = Path(filename).read_bytes()
+    old_configuration = loads(raw_configuration.decode("utf-8"))
 
     old_version = old_configuration.get('version', 0)
 
@@ -371,19 +450,30 @@ def upgrade(ctx, filename):
     log("Backing up old configuration to", backup_filename)
 
     try:
-        shutil.copyfile(filename, backup_filename)
+        Path(backup_filename).write_bytes(raw_configuration)
     except PermissionError as e:
         log("Could not backup configuration!", lvl=warn)
 
+    latest_version = max(upgrade_table)
+
     log(old_configuration, pretty=True, lvl=verbose)
-    log(old_version, max(upgrade_table), lvl=verbose)
+    log(old_version, latest_version, lvl=verbose)
+
+    # Renames work on the serialized configuration and are applied at the end,
+    # one pass per upgrade step
+    renames = []
 
-    for upgrade in range(old_version, max(upgrade_table)):
-        log("Processing meta upgrade to", upgrade)
+    for upgrade in range(old_version, latest_version):
+        log("Processing upgrade to", upgrade)
 
-        for operation in upgrade_table[old_version + 1]:
+        operations = upgrade_table[upgrade + 1]
+        step_renames = []
+        renames.append(step_renames)
+        for operation in operations:
             log(operation, pretty=True)
             for rule, transformations in operation.items():
+                if not transformations:
+                    continue
                 if rule == 'add':
                     for item, default_value in transformations.items():
                         if item not in old_configuration:
@@ -392,6 +482,8 @@ def upgrade(ctx, filename):
                             log("Item %s is already present" % item)
                 if rule == 'tableize':
                     for item, table_values in transformations.items():
+                        if not table_values:
+                            continue
                         log('Tableizing attributes under', item)
                         new_table = table()
 
@@ -403,17 +495,12 @@ def upgrade(ctx, filename):
 
                         log(new_table, pretty=True)
                         old_configuration.add(item, new_table)
+                if rule == 'rename':
+                    step_renames.extend(transformations)
 
     new_configuration = dumps(old_configuration)
 
-    for upgrade in range(old_version, max(upgrade_table)):
-        log("Processing textual upgrade to", upgrade)
-
-        for operation in upgrade_table[old_version + 1]:
-            for rule, transformations in operation.items():
-                if rule == 'rename':
-                    for rename_value in transformations:
-                        log("Renaming", rename_value[0], rename_value[1])
-                        new_configuration = new_configuration.replace(rename_value[0], rename_value[1])
+    for step_renames in renames:
+        new_configuration = _apply_renames(new_configuration, step_renames)
 
     log(new_configuration, pretty=True)
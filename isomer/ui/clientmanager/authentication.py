@@ -29,8 +29,6 @@ Handles authentication and authorization related aspects
 
 """
 
-import json
-
 from circuits.net.events import write
 
 from isomer.component import handler
@@ -48,6 +46,7 @@ from isomer.misc import i18n as _
 from isomer.ui.clientobjects import Client, User
 
 from isomer.ui.clientmanager.basemanager import ClientBaseManager
+from isomer.ui.clientmanager.encoder import dumps
 
 
 class AuthenticationManager(ClientBaseManager):
@@ -59,6 +58,9 @@ class AuthenticationManager(ClientBaseManager):
         self.authorized_events = {}
         self.anonymous_events = {}
 
+        self._authorized_dispatch = {}
+        self._anonymous_dispatch = {}
+
     @handler("ready")
     def ready(self):
         """Compile events"""
@@ -66,6 +68,19 @@ class AuthenticationManager(ClientBaseManager):
         self.authorized_events = get_user_events()
         self.anonymous_events = get_anonymous_events()
 
+        self._authorized_dispatch = self._build_dispatch(self.authorized_events)
+        self._anonymous_dispatch = self._build_dispatch(self.anonymous_events)
+
+    @staticmethod
+    def _build_dispatch(events):
+        """Flatten registered events to a (component, action) -> event table"""
+
+        return {
+            (component, action): event["event"]
+            for component, actions in events.items()
+            for action, event in actions.items()
+        }
+
     @handler("authentication", channel="auth")
     def authentication(self, event):
         """Links the client to the granted account and profile,
@@ -100,7 +115,7 @@ class AuthenticationManager(ClientBaseManager):
                 # problems
                 # which could be remedied by duplicating the configuration
             else:
-                signedinuser.clients.append(clientuuid)
+                signedinuser.clients.add(clientuuid)
                 self.log(
                     "Active client (",
                     clientuuid,
@@ -134,6 +149,7 @@ class AuthenticationManager(ClientBaseManager):
 
             del self._clients[originatingclientuuid]
             self._clients[clientuuid] = newclient
+            self._sock_clients[event.sock] = newclient
 
             authpacket = {
                 "component": "auth",
@@ -141,7 +157,7 @@ class AuthenticationManager(ClientBaseManager):
                 "data": account.serializablefields(),
             }
             self.log("Transmitting Authorization to client", authpacket, lvl=network)
-            self.fireEvent(write(event.sock, json.dumps(authpacket)), "wsserver")
+            self.fireEvent(write(event.sock, dumps(authpacket)), "wsserver")
 
             profilepacket = {
                 "component": "profile",
@@ -149,7 +165,7 @@ class AuthenticationManager(ClientBaseManager):
                 "data": profile.serializablefields(),
             }
             self.log("Transmitting Profile to client", profilepacket, lvl=network)
-            self.fireEvent(write(event.sock, json.dumps(profilepacket)), "wsserver")
+            self.fireEvent(write(event.sock, dumps(profilepacket)), "wsserver")
 
             clientconfigpacket = {
                 "component": "clientconfig",
@@ -162,7 +178,7 @@ class AuthenticationManager(ClientBaseManager):
                 lvl=network,
             )
             self.fireEvent(
-                write(event.sock, json.dumps(clientconfigpacket)), "wsserver"
+                write(event.sock, dumps(clientconfigpacket)), "wsserver"
             )
 
             self.fireEvent(userlogin(clientuuid, useruuid, clientconfig, signedinuser))
@@ -243,7 +259,13 @@ class AuthenticationManager(ClientBaseManager):
             if component == "debugger":
                 self.log(component, action, data, user, client, lvl=info)
 
-            if not user and component in self.authorized_events.keys():
+            event_class = self._authorized_dispatch.get((component, action))
+
+            if event_class is None:
+                self.log("Unknown authorized event:", component, action, lvl=warn)
+                return
+
+            if not user:
                 self.log(
                     "Unknown client tried to do an authenticated operation: %s",
                     component,
@@ -253,9 +275,7 @@ class AuthenticationManager(ClientBaseManager):
                 )
                 return
 
-            event = self.authorized_events[component][action]["event"](
-                user, action, data, client
-            )
+            event = event_class(user, action, data, client)
 
             self.log("Authorized event roles:", event.roles, lvl=verbose)
             if not self._check_permissions(user, event):
@@ -284,7 +304,7 @@ class AuthenticationManager(ClientBaseManager):
     def _handle_anonymous_events(self, component, action, data, client):
         """Handler for anonymous (public) events"""
         try:
-            event = self.anonymous_events[component][action]["event"]
+            event = self._anonymous_dispatch[(component, action)]
 
             self.log(
                 "Firing anonymous event: ",
@@ -29,7 +29,6 @@ Basic client management functionality and component set up.
 
 """
 
-import json
 from base64 import b64decode
 from time import time
 from uuid import uuid4
@@ -40,10 +39,10 @@ from isomer.component import ConfigurableComponent, handler
 from isomer.database import objectmodels
 from isomer.events.client import clientdisconnect, userlogout, send
 
-from isomer.logger import debug, critical, verbose, error, warn, network
+from isomer.logger import debug, critical, verbose, error, warn, network, is_enabled
 from isomer.ui.clientobjects import Socket, Client, User
 
-from isomer.ui.clientmanager.encoder import ComplexEncoder
+from isomer.ui.clientmanager.encoder import dumps, loads
 
 
 from isomer.events.objectmanager import search, get
@@ -66,6 +65,8 @@ class ClientBaseManager(ConfigurableComponent):
 
         self._clients = {}
         self._sockets = {}
+        # Shortcut from sockets directly to their clients for incoming requests
+        self._sock_clients = {}
         self._users = {}
         self._count = 0
         self._user_mapping = {}
@@ -107,10 +108,11 @@ class ClientBaseManager(ConfigurableComponent):
                             type(e),
                             lvl=critical,
                         )
-                self.log("Deleting Client (", self._clients.keys, ")", lvl=debug)
+                self.log("Deleting Client (", list(self._clients), ")", lvl=debug)
                 del self._clients[clientuuid]
                 self.log("Deleting Socket", lvl=debug)
                 del self._sockets[sock]
+                self._sock_clients.pop(sock, None)
         except Exception as e:
             self.log("Error during disconnect handling: ", e, type(e), lvl=critical)
 
@@ -158,6 +160,7 @@ class ClientBaseManager(ConfigurableComponent):
                 self._clients[clientuuid] = Client(
                     sock=sock, ip=ip, clientuuid=clientuuid
                 )
+                self._sock_clients[sock] = self._clients[clientuuid]
 
                 self.log("Client connected:", clientuuid, lvl=debug)
             else:
@@ -173,7 +176,10 @@ class ClientBaseManager(ConfigurableComponent):
         UUID"""
 
         try:
-            jsonpacket = json.dumps(event.packet, cls=ComplexEncoder)
+            # Raw packets are passed through, others are encoded exactly once
+            # for all receiving clients
+            jsonpacket = event.packet if event.raw else dumps(event.packet)
+
             if event.sendtype == "user":
                 # TODO: I think, caching a user name <-> uuid table would
                 # make sense instead of looking this up all the time.
@@ -189,11 +195,12 @@ class ClientBaseManager(ConfigurableComponent):
                 else:
                     uuid = userobject.uuid
 
-                self.log(
-                    "Broadcasting to all of users clients: '%s': '%s"
-                    % (uuid, str(event.packet)[:20]),
-                    lvl=network,
-                )
+                if is_enabled(network):
+                    self.log(
+                        "Broadcasting to all of users clients: '%s': '%s"
+                        % (uuid, str(event.packet)[:20]),
+                        lvl=network,
+                    )
                 if uuid not in self._users:
                     self.log("User not connected!", event, lvl=critical)
                     return
@@ -203,18 +210,21 @@ class ClientBaseManager(ConfigurableComponent):
                     sock = self._clients[clientuuid].sock
 
                     if not event.raw:
-                        self.log("Sending json to client", jsonpacket[:50], lvl=network)
-
-                        self.fireEvent(write(sock, jsonpacket), "wsserver")
+                        if is_enabled(network):
+                            self.log(
+                                "Sending json to client", jsonpacket[:50], lvl=network
+                            )
                     else:
-                        self.log("Sending raw data to client")
-                        self.fireEvent(write(sock, event.packet), "wsserver")
+                        self.log("Sending raw data to client", lvl=network)
+
+                    self.fireEvent(write(sock, jsonpacket), "wsserver")
             else:  # only to client
-                self.log(
-                    "Sending to user's client: '%s': '%s'"
-                    % (event.uuid, jsonpacket[:50]),
-                    lvl=network,
-                )
+                if is_enabled(network):
+                    self.log(
+                        "Sending to user's client: '%s': '%s'"
+                        % (event.uuid, str(jsonpacket)[:50]),
+                        lvl=network,
+                    )
                 if event.uuid not in self._clients:
                     if not event.fail_quiet:
                         self.log("Unknown client!", event.uuid, lvl=critical)
@@ -222,11 +232,9 @@ class ClientBaseManager(ConfigurableComponent):
                     return
 
                 sock = self._clients[event.uuid].sock
-                if not event.raw:
-                    self.fireEvent(write(sock, jsonpacket), "wsserver")
-                else:
+                if event.raw:
                     self.log("Sending raw data to client", lvl=network)
-                    self.fireEvent(write(sock, event.packet[:20]), "wsserver")
+                self.fireEvent(write(sock, jsonpacket), "wsserver")
 
         except Exception as e:
             self.log(
@@ -242,8 +250,13 @@ class ClientBaseManager(ConfigurableComponent):
             if event.broadcasttype == "users":
                 if len(self._users) > 0:
                     self.log("Broadcasting to all users:", event.content, lvl=network)
-                    for useruuid in self._users.keys():
-                        self.fireEvent(send(useruuid, event.content, sendtype="user"))
+                    packet = dumps(event.content)
+                    for user in self._users.values():
+                        for clientuuid in user.clients:
+                            client = self._clients.get(clientuuid)
+                            if client is None:
+                                continue
+                            self.fireEvent(write(client.sock, packet), "wsserver")
                         # else:
                         #    self.log("Not broadcasting, no users connected.",
                         #            lvl=debug)
@@ -265,14 +278,15 @@ class ClientBaseManager(ConfigurableComponent):
                         "Broadcasting to group: ", event.content, event.group,
                         lvl=network
                     )
-                    for participant in set(event.group):
-                        if event.broadcasttype == 'usergroup':
-                            broadcast_type = "user"
-                        else:
-                            broadcast_type = "client"
+                    if event.broadcasttype == 'usergroup':
+                        broadcast_type = "user"
+                    else:
+                        broadcast_type = "client"
 
-                        broadcast = send(participant, event.content,
-                                         sendtype=broadcast_type)
+                    packet = dumps(event.content)
+                    for participant in set(event.group):
+                        broadcast = send(participant, packet,
+                                         sendtype=broadcast_type, raw=True)
                         self.fireEvent(broadcast)
             elif event.broadcasttype == "socks":
                 if len(self._sockets) > 0:
@@ -314,7 +328,11 @@ class ClientBaseManager(ConfigurableComponent):
                 self._bans[ip] = time()
                 return
 
-            client_uuid = self._sockets[sock].clientuuid
+            client = self._sock_clients.get(sock)
+            if client is not None:
+                client_uuid = client.uuid
+            else:
+                client_uuid = self._sockets[sock].clientuuid
         except Exception as e:
             self.log("Receiving error: ", e, type(e), lvl=error, exc=True)
             return
@@ -327,7 +345,7 @@ class ClientBaseManager(ConfigurableComponent):
             return
 
         try:
-            msg = json.loads(msg)
+            msg = loads(msg)
             self.log("Message from client received: ", msg, lvl=network)
         except Exception as e:
             self.log("JSON Decoding failed! %s (%s of %s)" % (msg, e, type(e)))
@@ -346,6 +364,10 @@ class ClientBaseManager(ConfigurableComponent):
             self.log("Unpacking error: ", msg, e, type(e), lvl=error)
             return
 
+        if not isinstance(request_component, str) or not isinstance(request_action, str):
+            self.log("Invalid component or action: ", msg, lvl=error)
+            return
+
         if self._check_flood_protection(request_component, request_action, client_uuid):
             self.log("Flood protection triggered")
             self._flooding[client_uuid] = time()
@@ -368,25 +390,24 @@ class ClientBaseManager(ConfigurableComponent):
             return
         else:
             self._forward_event(
-                client_uuid, request_component, request_action, request_data
+                client_uuid, request_component, request_action, request_data, client
             )
 
     def _forward_event(
-        self, client_uuid, request_component, request_action, request_data
+        self, client_uuid, request_component, request_action, request_data,
+        client=None
     ):
         """Determine what exactly to do with the event and forward it to its
         destination"""
 
-        try:
-            client = self._clients[client_uuid]
-        except KeyError as e:
-            self.log("Could not get client for request!", e, type(e), lvl=warn)
+        if client is None:
+            client = self._clients.get(client_uuid)
+
+        if client is None:
+            self.log("Could not get client for request!", client_uuid, lvl=warn)
             return
 
-        if (
-            request_component in self.anonymous_events
-            and request_action in self.anonymous_events[request_component]
-        ):
+        if (request_component, request_action) in self._anonymous_dispatch:
             self.log("Executing anonymous event:", request_component, request_action)
             try:
                 self._handle_anonymous_events(
@@ -411,15 +432,13 @@ class ClientBaseManager(ConfigurableComponent):
 
             self.log("Checking if user is logged in", lvl=verbose)
 
-            try:
-                user = self._users[user_uuid]
-            except KeyError:
+            user = self._users.get(user_uuid)
+            if user is None:
                 if not (
                     request_action == "ping"
                     and request_component == "isomer.ui.clientmanager.latency"
                 ):
                     self.log("User not logged in.", lvl=warn)
-                user = None
 
             if user is None:
                 if self._public_access is True:
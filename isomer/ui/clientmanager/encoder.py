@@ -32,6 +32,12 @@ Enhanced JSON encoding
 import datetime
 import json
 
+# Optional, installed with the 'json' extra
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class ComplexEncoder(json.JSONEncoder):
     """A JSON encoder that converts dates to ISO 8601 formatting"""
@@ -42,3 +48,42 @@ class ComplexEncoder(json.JSONEncoder):
             return obj.isoformat()
             # Let the base class default method raise the TypeError
         return json.JSONEncoder.default(self, obj)
+
+
+if orjson is not None:
+    # Dates are passed through to the default hook, so they are formatted
+    # exactly like the ComplexEncoder does
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+else:
+    ORJSON_OPTIONS = None
+
+
+def _orjson_default(obj):
+    """Convert datetime objects to ISO 8601 format for orjson"""
+    if isinstance(obj, (datetime.time, datetime.date)):
+        return obj.isoformat()
+    raise TypeError("Object of type %s is not JSON serializable" % type(obj).__name__)
+
+
+def dumps(obj):
+    """Encode a packet as JSON string, using orjson if it is available"""
+
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                obj, default=_orjson_default, option=ORJSON_OPTIONS
+            ).decode("utf-8")
+        except TypeError:
+            # E.g. integers beyond 64 bit, which only the json module handles
+            pass
+
+    return json.dumps(obj, cls=ComplexEncoder)
+
+
+def loads(data):
+    """Decode a JSON packet, using orjson if it is available"""
+
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
@@ -96,7 +96,7 @@ class User(object):
         """
 
         super(User, self).__init__()
-        self.clients = []
+        self.clients = set()
         self.uuid = uuid
         self.profile = profile
         self.account = account
@@ -41,45 +41,63 @@ ignore = [
     "/docs/build",
     "__pycache__"
 ]
+# Ignore entries without their leading slash, for matching against paths
+ignore_parts = tuple(part[1:] if part.startswith("/") else part for part in ignore)
+
 datafiles = []
 manifestfiles = []
 
 
 def prune(thing):
+    return any(part in thing for part in ignore_parts)
+
+
+def write_manifest(*paths):
+    """Write MANIFEST.in from directives only, sdist does the recursion"""
+
+    manifest = []
+
+    for path in paths:
+        if os.path.isfile(path):
+            manifest.append("include " + path + "\n")
+        else:
+            manifest.append("recursive-include " + path + " *\n")
+
     for part in ignore:
-        part = part[1:] if part.startswith("/") else part
-        if part in thing:
-            return True
-    return False
+        if part.startswith("/"):
+            manifest.append("prune " + part[1:] + "\n")
+        else:
+            manifest.append("global-exclude " + part + "/*\n")
 
+    with open("MANIFEST.in", "w") as f:
+        f.write("".join(manifest))
 
-def add_datafiles(*paths):
-    with open("MANIFEST.in", "w") as manifest:
-        for path in paths:
-            files = []
-            if os.path.isfile(path):
-                manifest.write("include " + path + "\n")
-                continue
 
-            manifest.write("recursive-include " + path + " *\n")
+def add_datafiles(*paths):
+    for path in paths:
+        files = []
+        if os.path.isfile(path):
+            continue
 
-            for root, dirnames, filenames in os.walk(path):
-                for filename in filenames:
-                    datafile = os.path.join(root, filename)
+        for root, dirnames, filenames in os.walk(path):
+            # Don't descend into ignored trees like node_modules at all
+            dirnames[:] = [
+                dirname
+                for dirname in dirnames
+                if not prune(os.path.join(root, dirname))
+            ]
 
-                    if not prune(datafile):
-                        files.append(datafile)
-                        manifestfiles.append(datafile)
+            for filename in filenames:
+                datafile = os.path.join(root, filename)
 
-            datafiles.append((path, files))
+                if not prune(datafile):
+                    files.append(datafile)
+                    manifestfiles.append(datafile)
 
-        for part in ignore:
-            if part.startswith("/"):
-                manifest.write("prune " + part[1:] + "\n")
-            else:
-                manifest.write("global-exclude " + part + "/*\n")
+        datafiles.append((path, files))
 
 
+write_manifest("frontend", "docs", "locale")
 add_datafiles("frontend", "docs", "locale")
 
 with open("README.rst", "r") as f:
@@ -146,6 +164,7 @@ setup(
         "dpath>=2.0.1",
         "formal>=0.6.3",
         "gitpython>=3.1.8",
+        "importlib_metadata>=3.6; python_version < '3.8'",
         "jsonschema>=3.2.0",
         "networkx",
         "numpy>=1.16.2",
@@ -163,42 +182,56 @@ setup(
         "typing_extensions>=3.7.4.2",
 
     ],
+    extras_require={
+        "compression": [
+            "python-snappy",
+            "zstandard",
+        ],
+        "json": [
+            "orjson>=3.3",
+        ],
+        "validation": [
+            "fastjsonschema",
+        ],
+    },
     data_files=datafiles,
-    entry_points="""[console_scripts]
-    isomer=isomer.iso:main
-    iso=isomer.iso:main
-
-    [isomer.base]
-    debugger=isomer.debugger:IsomerDebugger
-    cli=isomer.debugger:CLI
-    syslog=isomer.ui.syslog:Syslog
-    maintenance=isomer.database.components:Maintenance
-    backup=isomer.database.components:BackupManager
-    memlog=isomer.debugger:MemoryLogger
-
-    [isomer.sails]
-    auth=isomer.ui.auth:Authenticator
-    clientmanager=isomer.ui.clientmanager:ClientManager
-    objectmanager=isomer.ui.objectmanager:ObjectManager
-    schemamanager=isomer.ui.schemamanager:SchemaManager
-    tagmanager=isomer.ui.tagmanager:TagManager
-    configurator=isomer.ui.configurator:Configurator
-    store=isomer.ui.store.component:Store
-    instanceinfo=isomer.ui.instance:InstanceInfo
-
-    [isomer.schemata]
-    systemconfig=isomer.schemata.system:Systemconfig
-    client=isomer.schemata.client:Client
-    profile=isomer.schemata.profile:Profile
-    user=isomer.schemata.user:User
-    logmessage=isomer.schemata.logmessage:LogMessage
-    tag=isomer.schemata.tag:Tag
-    theme=isomer.schemata.theme:Theme
-
-    [isomer.provisions]
-    system=isomer.provisions.system:provision
-    user=isomer.provisions.user:provision
-    """,
+    entry_points={
+        "console_scripts": [
+            "isomer = isomer.iso:main",
+            "iso = isomer.iso:main",
+        ],
+        "isomer.base": [
+            "debugger = isomer.debugger:IsomerDebugger",
+            "cli = isomer.debugger:CLI",
+            "syslog = isomer.ui.syslog:Syslog",
+            "maintenance = isomer.database.components:Maintenance",
+            "backup = isomer.database.components:BackupManager",
+            "memlog = isomer.debugger:MemoryLogger",
+        ],
+        "isomer.sails": [
+            "auth = isomer.ui.auth:Authenticator",
+            "clientmanager = isomer.ui.clientmanager:ClientManager",
+            "objectmanager = isomer.ui.objectmanager:ObjectManager",
+            "schemamanager = isomer.ui.schemamanager:SchemaManager",
+            "tagmanager = isomer.ui.tagmanager:TagManager",
+            "configurator = isomer.ui.configurator:Configurator",
+            "store = isomer.ui.store.component:Store",
+            "instanceinfo = isomer.ui.instance:InstanceInfo",
+        ],
+        "isomer.schemata": [
+            "systemconfig = isomer.schemata.system:Systemconfig",
+            "client = isomer.schemata.client:Client",
+            "profile = isomer.schemata.profile:Profile",
+            "user = isomer.schemata.user:User",
+            "logmessage = isomer.schemata.logmessage:LogMessage",
+            "tag = isomer.schemata.tag:Tag",
+            "theme = isomer.schemata.theme:Theme",
+        ],
+        "isomer.provisions": [
+            "system = isomer.provisions.system:provision",
+            "user = isomer.provisions.user:provision",
+        ],
+    },
     use_scm_version={
         "write_to": "isomer/scm_version.py",
     },
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# Isomer - The distributed application framework
+# ==============================================
+# Copyright (C) 2011-2020 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Isomer - Backend
+
+Test Isomer Database
+====================
+
+
+
+"""
+
+import pytest
+
+import isomer.database
+from isomer.database import LazyFactoryMap
+
+
+@pytest.fixture
+def built(monkeypatch):
+    """Replace the model factory builder with one recording its calls"""
+
+    calls = []
+
+    def fake_factory(schema):
+        if schema.get("broken", False):
+            raise ValueError("Broken schema")
+        calls.append(schema["id"])
+        return "factory:" + schema["id"]
+
+    monkeypatch.setattr(isomer.database, "cached_model_factory", fake_factory)
+
+    return calls
+
+
+STORE = {
+    "foo": {"schema": {"id": "#foo"}},
+    "bar": {"schema": {"id": "#bar"}},
+    "noschema": {"form": []},
+    "broken": {"schema": {"id": "#broken", "broken": True}},
+}
+
+
+def test_lazy_factory_map_mapping(built):
+    """Tests only buildable schemata are listed"""
+
+    factories = LazyFactoryMap(STORE)
+
+    assert factories["foo"] == "factory:#foo"
+    assert built == ["#foo"]
+
+    assert list(factories) == ["foo", "bar"]
+    assert len(factories) == 2
+    assert dict(factories.items()) == {"foo": "factory:#foo", "bar": "factory:#bar"}
+    assert "foo" in factories
+    assert "baz" not in factories
+    assert built == ["#foo", "#bar"]
+
+
+def test_lazy_factory_map_builds_once(built):
+    """Tests factories are built on first access and then reused"""
+
+    factories = LazyFactoryMap(STORE)
+
+    assert factories["foo"] == "factory:#foo"
+    assert factories["foo"] == "factory:#foo"
+    assert factories.get("bar") == "factory:#bar"
+    assert built == ["#foo", "#bar"]
+
+
+def test_lazy_factory_map_errors(built):
+    """Tests unknown, schemaless and unbuildable entries raise KeyError"""
+
+    factories = LazyFactoryMap(STORE)
+
+    for name in ("baz", "noschema", "broken"):
+        with pytest.raises(KeyError):
+            factories[name]
+
+    assert factories.get("broken") is None
+    assert built == []
+
+
+def test_lazy_factory_map_failed_not_listed(built):
+    """Tests schemata are not listed anymore after their build failed"""
+
+    factories = LazyFactoryMap(STORE)
+
+    with pytest.raises(KeyError):
+        factories["broken"]
+
+    assert "broken" not in factories
+    assert "broken" not in list(factories)
+    assert "noschema" not in factories
+    assert len(factories) == 2
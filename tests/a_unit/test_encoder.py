@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+# Isomer - The distributed application framework
+# ==============================================
+# Copyright (C) 2011-2020 Heiko 'riot' Weinen <riot@c-base.org> and others.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Isomer - Backend
+
+Test Isomer Clientmanager Encoder
+=================================
+
+
+
+"""
+
+import datetime
+import json
+
+from isomer.ui.clientmanager import encoder
+
+
+def test_dumps_datetime():
+    """Tests dates and times are encoded in ISO 8601 format"""
+
+    packet = {
+        "datetime": datetime.datetime(2020, 1, 2, 3, 4, 5),
+        "date": datetime.date(2020, 1, 2),
+        "time": datetime.time(3, 4, 5),
+    }
+
+    result = json.loads(encoder.dumps(packet))
+
+    assert result == {
+        "datetime": "2020-01-02T03:04:05",
+        "date": "2020-01-02",
+        "time": "03:04:05",
+    }
+
+
+def test_dumps_non_string_keys():
+    """Tests non string keys are converted like the json module does"""
+
+    packet = {1: "one", "two": {3: "three"}}
+
+    assert json.loads(encoder.dumps(packet)) == json.loads(json.dumps(packet))
+
+
+def test_dumps_big_integer():
+    """Tests integers beyond 64 bit are encoded"""
+
+    packet = {"big": 2 ** 70, "negative": -(2 ** 70)}
+
+    assert json.loads(encoder.dumps(packet)) == packet
+
+
+def test_dumps_json_fallback(monkeypatch):
+    """Tests encoding without orjson"""
+
+    monkeypatch.setattr(encoder, "orjson", None)
+
+    packet = {"date": datetime.date(2020, 1, 2), 1: "one"}
+
+    assert encoder.dumps(packet) == '{"date": "2020-01-02", "1": "one"}'
+
+
+def test_loads():
+    """Tests decoding a packet"""
+
+    data = '{"component": "isomer.test", "data": [1, 2.5, null]}'
+    expected = {"component": "isomer.test", "data": [1, 2.5, None]}
+
+    assert encoder.loads(data) == expected
+
+
+def test_loads_json_fallback(monkeypatch):
+    """Tests decoding without orjson"""
+
+    monkeypatch.setattr(encoder, "orjson", None)
+
+    assert encoder.loads('{"1": [true]}') == {"1": [True]}
@@ -63,3 +63,17 @@ def test_script_logging():
     lastlog = logger.LiveLog[-1][-1]
 
     assert "FOOBAR" in lastlog
+
+
+def test_level_enabled():
+    """Tests if level checks follow the global verbosity"""
+
+    old_level = logger.get_verbosity()["global"]
+    logger.set_verbosity(logger.warn)
+
+    try:
+        assert logger.is_enabled(logger.error)
+        assert logger.is_enabled(logger.warn)
+        assert not logger.is_enabled(logger.debug)
+    finally:
+        logger.set_verbosity(old_level)
@@ -31,7 +31,7 @@ Test Isomer Basic Schemata
 import pytest
 from isomer.schemastore import schemastore
 
-schemata = schemastore.keys()
+schemata = sorted(schemastore.keys())
 
 
 @pytest.mark.parametrize('schemaname', schemata)
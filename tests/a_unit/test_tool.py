@@ -61,4 +61,90 @@ def test_view_no_objects():
     assert "Done: cli db objects view" in result.output
 
 
+def test_upgrade_chained_renames():
+    """Renames of consecutive upgrade steps chain, longer names match first"""
 
+    from isomer.tool.system import _apply_renames
+
+    configuration = 'old = "old"\nolder = 1\n'
+
+    step_one = _apply_renames(configuration, [("older", "oldest"), ("old", "mid")])
+    result = _apply_renames(step_one, [("mid", "new")])
+
+    assert result == 'new = "new"\noldest = 1\n'
+
+
+def test_upgrade_renames_within_step():
+    """Chains within a step resolve and the first rename of a name wins"""
+
+    from isomer.tool.system import _apply_renames
+
+    assert _apply_renames("a b", [("a", "b"), ("b", "c")]) == "c c"
+    assert _apply_renames("a", [("a", "b"), ("a", "c")]) == "b"
+
+
+def test_shallow_diff():
+    """Differences are listed by dotted path, descending only into dicts"""
+
+    from isomer.tool.objects import _shallow_diff
+
+    a = {"name": "foo", "same": 1, "nested": {"x": 1, "y": [1, 2]}, "only_a": 2}
+    b = {"name": "bar", "same": 1, "nested": {"x": 1, "y": [1, 3]}, 5: True}
+
+    assert _shallow_diff(a, b) == [
+        ("5", None, True),
+        ("name", "foo", "bar"),
+        ("nested.y", [1, 2], [1, 3]),
+        ("only_a", 2, None),
+    ]
+
+
+def test_shallow_diff_equal_and_type_change():
+    """Equal dicts have no differences, replaced dicts are not descended"""
+
+    from isomer.tool.objects import _shallow_diff
+
+    assert _shallow_diff({"a": {"b": 1}}, {"a": {"b": 1}}) == []
+    assert _shallow_diff({"a": {"b": 1}}, {"a": [1]}) == [("a", {"b": 1}, [1])]
+
+
+def test_find_fields():
+    """Fields are found by name and by type in nested and array schemata"""
+
+    from isomer.tool.objects import _find_fields
+
+    schema = {
+        "properties": {
+            "name": {"type": "string"},
+            "position": {
+                "type": "object",
+                "properties": {"lat": {"type": "string"}, "name": {"type": "string"}},
+            },
+            "members": {
+                "type": "array",
+                "items": {"type": "object", "properties": {"level": {"type": "number"}}},
+            },
+            "broken": "not a definition",
+        }
+    }
+
+    assert _find_fields(schema, "name") == ["top", "position"]
+    assert _find_fields(schema, "level") == ["members"]
+    assert _find_fields(schema, "number", by_type=True) == [("members", "level")]
+    assert _find_fields(schema, "string", by_type=True) == [
+        ("top", "name"),
+        ("position", "lat"),
+        ("position", "name"),
+    ]
+    assert _find_fields(schema, "missing") == []
+
+
+def test_find_fields_shared_subschema():
+    """Subschemata referenced more than once are only examined once"""
+
+    from isomer.tool.objects import _find_fields
+
+    shared = {"type": "object", "properties": {"uuid": {"type": "string"}}}
+    schema = {"properties": {"owner": shared, "creator": shared}}
+
+    assert _find_fields(schema, "uuid") == ["owner"]